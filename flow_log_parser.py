@@ -1,22 +1,40 @@
 import argparse
 import csv
+import io
+import mmap
 import os
+import sys
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 # Ref: https://www.iana.org/assignments/protocol-numbers/protocol-numbers.xhtml
 PROTOCOL_MAP = {
-    1: "icmp",
-    6: "tcp",
-    17: "udp",
-}  # Map of protocol numbers to actual protocol names, currently only ICMP, TCP and UDP are supported
+    "1": "icmp",
+    "6": "tcp",
+    "17": "udp",
+}  # Map of protocol numbers (as they appear in the log) to actual protocol names, currently only ICMP, TCP and UDP are supported
 
 # Ref: https://docs.aws.amazon.com/vpc/latest/userguide/flow-log-records.html
-NUM_FIELDS = 14  # Number of fields in the flow log file
+# Only fields up to the protocol (index 7) are needed, so stop splitting after it.
+# Records are only checked for having these fields, not all 14 of the format.
+MAX_SPLIT = 8
+
+# Read the flow log in 4 MiB blocks to keep memory usage flat
+CHUNK_SIZE = 4 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024  # 1 MiB OS read buffer for input files
+
+UNTAGGED = "Untagged"  # Tag counted for records without a match in the lookup table
 
 
 def load_lookup_table(lookup_file, verbose=False):
     """Loads the lookup table from the given file.
 
+    Loaded tables are cached on the file's path, modification time and size,
+    so loading an unchanged file again returns the cached table without
+    re-reading it. Editing the file invalidates its entry. Warnings for
+    malformed rows are printed on every verbose load, cached or not.
+
     Args:
         lookup_file (str): The path to the lookup table file.
         verbose (bool, optional): Whether to print verbose output. Defaults to
@@ -24,27 +42,229 @@ def load_lookup_table(lookup_file, verbose=False):
 
     Returns:
         dict: A dictionary with port/protocol combinations as keys and tags as
-        values.
+        values. The dictionary is shared between calls and must not be
+        modified.
     """
-    lookup = {}
     try:
-        with open(lookup_file, "r") as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip header
-            for line_number, row in enumerate(reader, 1):
-                if len(row) == 3:
-                    port, protocol, tag = row
-                    lookup[(port.strip(), protocol.strip())] = tag.strip()
-                elif verbose:
-                    print(
-                        f"Warning: Malformed lookup data at line {line_number}. Skipping..."
-                    )
+        stat = os.stat(lookup_file)
     except Exception as e:
         print(f"Error reading lookup file: {e}")
         raise  # Error handling
+
+    lookup, malformed_lines = _load_lookup_cached(
+        lookup_file, stat.st_mtime_ns, stat.st_size
+    )
+    if verbose:
+        for line_number in malformed_lines:
+            print(f"Warning: Malformed lookup data at line {line_number}. Skipping...")
     return lookup
 
 
+@lru_cache(maxsize=32)
+def _load_lookup_cached(lookup_file, mtime_ns, size):
+    """Reads the lookup table, cached by load_lookup_table.
+
+    Args:
+        lookup_file (str): The path to the lookup table file.
+        mtime_ns (int): The file's modification time, part of the cache key.
+        size (int): The file's size, part of the cache key.
+
+    Returns:
+        tuple: A tuple containing the dictionary with port/protocol
+        combinations as keys and tags as values, and a tuple of the line
+        numbers of the malformed rows that were skipped.
+    """
+    lookup = {}
+    malformed_lines = []
+    try:
+        with open(lookup_file, "r", buffering=BUFFER_SIZE) as file:
+            data = file.read()
+
+        if '"' in data:  # Quoted fields need the full csv parser
+            reader = csv.reader(io.StringIO(data))
+        else:  # Plain comma splits give the same rows without the csv parser overhead
+            # Text mode already normalized line endings, so split on "\n" only, like
+            # csv.reader does, and drop the empty string after the final newline
+            lines = data.split("\n")
+            if not lines[-1]:
+                lines.pop()
+            reader = (line.split(",") for line in lines)
+
+        next(reader)  # Skip header
+        for line_number, row in enumerate(reader, 1):
+            if len(row) == 3:
+                port, protocol, tag = row
+                # Interned tags are shared objects, so counting them compares by identity
+                lookup[(port.strip(), protocol.strip())] = sys.intern(tag.strip())
+            else:
+                malformed_lines.append(line_number)
+    except Exception as e:
+        print(f"Error reading lookup file: {e}")
+        raise  # Error handling
+    return lookup, tuple(malformed_lines)
+
+
+def _split_lines(data):
+    """Decodes a block of complete lines and splits it into lines.
+
+    Like reading the file in text mode, "\n", "\r\n" and a bare "\r" all end
+    a line.
+
+    Args:
+        data (bytes): The block, ending with a line terminator.
+
+    Returns:
+        list: The lines of the block, without their terminators.
+    """
+    text = data.decode()
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text[:-1].split("\n")
+
+
+def _read_line_chunks(file, chunk_size=CHUNK_SIZE, size=None):
+    """Reads the given file in large blocks and splits them into lines.
+
+    Each block is decoded with a single call, only up to its last line
+    terminator so a multi-byte character is never cut in half.
+
+    Args:
+        file (file): An open binary file or memory map.
+        chunk_size (int, optional): The number of bytes to read at a time.
+        Defaults to CHUNK_SIZE.
+        size (int, optional): The maximum number of bytes to read from the
+        current position. Defaults to None, reading to the end of the file.
+
+    Yields:
+        list: The complete lines read from the current block. A trailing partial
+        line is carried over to the next block.
+    """
+    remainder = b""
+    while size is None or size > 0:
+        data = file.read(chunk_size if size is None else min(chunk_size, size))
+        if not data:
+            break
+        if size is not None:
+            size -= len(data)
+
+        data = remainder + data
+        end = max(data.rfind(b"\n"), data.rfind(b"\r"))
+        if end == len(data) - 1 and data[end:] == b"\r":
+            # A trailing "\r" may be the first half of a "\r\n" split across
+            # blocks, so end the block at the terminator before it
+            end = max(data.rfind(b"\n", 0, end), data.rfind(b"\r", 0, end))
+        if end == -1:
+            remainder = data
+            continue
+        yield _split_lines(data[: end + 1])
+        remainder = data[end + 1 :]
+    if remainder:
+        if remainder[-1:] not in (b"\n", b"\r"):
+            remainder += b"\n"
+        yield _split_lines(remainder)
+
+
+def _count_records(file, lookup, size=None):
+    """Counts the tags and port/protocol combinations of the records in a file.
+
+    This is the quiet variant used by default, see _count_records_verbose for
+    the one that reports malformed records and matches.
+
+    Args:
+        file (file): An open binary flow log file or memory map.
+        lookup (dict): A dictionary with port/protocol combinations as keys and
+        tags as values.
+        size (int, optional): The maximum number of bytes to read from the
+        current position. Defaults to None, reading to the end of the file.
+
+    Returns:
+        tuple: A tuple containing two Counters. 1st contains the tag counts,
+        and 2nd contains the port/protocol counts.
+    """
+    # Count the raw (dstport, protocol number) pairs, the protocol names and tags
+    # are then resolved once per unique pair instead of once per record
+    raw_counts = Counter()
+
+    for lines in _read_line_chunks(file, size=size):
+        # Collect the block's keys, Counter.update() then counts them in C
+        keys = []
+        add_key = keys.append
+
+        for line in lines:
+            parts = line.split(None, MAX_SPLIT)
+
+            if len(parts) <= MAX_SPLIT:  # Skip empty lines and malformed data
+                continue
+
+            add_key((parts[6], parts[7]))  # Get port and protocol
+
+        raw_counts.update(keys)
+
+    tag_counts = Counter({UNTAGGED: 0})  # Always report untagged records
+    port_protocol_counts = Counter()
+    lookup_get = lookup.get
+    protocol_get = PROTOCOL_MAP.get
+
+    for (dstport, protocol), count in raw_counts.items():
+        # Convert protocol to actual protocol name, malformed numbers map to "Unknown"
+        key = (dstport, protocol_get(protocol, "Unknown"))
+        port_protocol_counts[key] += count
+        # Match with lookup table
+        tag_counts[lookup_get(key, UNTAGGED)] += count
+
+    return tag_counts, port_protocol_counts
+
+
+def _count_records_verbose(file, lookup):
+    """Counts the records in a file like _count_records, printing verbose output.
+
+    Args:
+        file (file): An open binary flow log file.
+        lookup (dict): A dictionary with port/protocol combinations as keys and
+        tags as values.
+
+    Returns:
+        tuple: A tuple containing two dictionaries. 1st contains the tag counts,
+        and 2nd contains the port/protocol counts.
+    """
+    tag_counts = {UNTAGGED: 0}  # Always report untagged records
+    port_protocol_counts = {}
+    tc_get = tag_counts.get
+    pp_get = port_protocol_counts.get
+    lookup_get = lookup.get
+    protocol_get = PROTOCOL_MAP.get
+
+    line_number = 0
+    for lines in _read_line_chunks(file):
+        for line_number, line in enumerate(lines, line_number + 1):
+            parts = line.split(None, MAX_SPLIT)
+
+            if not parts:  # Skip empty lines
+                continue
+
+            if len(parts) <= MAX_SPLIT:
+                print(
+                    f"Warning: Malformed log data at line {line_number}. Skipping..."
+                )  # Add warning for malformed data
+                continue
+
+            # Get port and protocol
+            # Convert protocol to actual protocol name, malformed numbers map to "Unknown"
+            key = (parts[6], protocol_get(parts[7], "Unknown"))
+
+            # Match with lookup table
+            tag = lookup_get(key)
+            if tag is not None:
+                print(f"Found tag for {key}: {tag}")
+            else:
+                tag = UNTAGGED
+
+            tag_counts[tag] = tc_get(tag, 0) + 1
+            port_protocol_counts[key] = pp_get(key, 0) + 1
+
+    return tag_counts, port_protocol_counts
+
+
 def parse_flow_logs(log_file, lookup, verbose=False):
     """Parses the flow logs and maps them to tags.
 
@@ -55,52 +275,116 @@ def parse_flow_logs(log_file, lookup, verbose=False):
         verbose (bool, optional): Whether to print verbose output. Defaults to
         False.
 
+    Returns:
+        tuple: A tuple containing two Counters. 1st contains the tag counts,
+        and 2nd contains the port/protocol counts.
+    """
+    try:
+        with open(log_file, "rb", buffering=BUFFER_SIZE) as file:
+            # Pick the variant once, so the quiet loop has no per-record verbose checks
+            count_records = _count_records_verbose if verbose else _count_records
+            tag_counts, port_protocol_counts = count_records(file, lookup)
+
+    except Exception as e:
+        print(f"Error reading log file: {e}")
+        raise  # Error handling
+
+    return Counter(tag_counts), Counter(port_protocol_counts)
+
+
+_worker_lookup = None  # Lookup table of a parse_flow_logs_parallel worker process
+
+
+def _init_worker(lookup):
+    """Stores the lookup table in a worker process, so it is sent only once."""
+    global _worker_lookup
+    _worker_lookup = lookup
+
+
+def _count_range(log_file, start, end):
+    """Counts the records between the given byte offsets in a worker process.
+
+    Args:
+        log_file (str): The path to the flow log file.
+        start (int): The offset of the first byte, at the start of a line.
+        end (int): The offset just past the last byte, at the start of a line
+        or the end of the file.
+
     Returns:
         tuple: A tuple containing two dictionaries. 1st contains the tag counts,
         and 2nd contains the port/protocol counts.
     """
-    tag_counts = Counter()
+    # Map the file instead of reading it, each worker only pages in its own range
+    with open(log_file, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as log_map:
+        log_map.seek(start)
+        return _count_records(log_map, _worker_lookup, size=end - start)
+
+
+def _split_ranges(log_file, parts):
+    """Splits the flow log into byte ranges aligned to line boundaries.
+
+    Args:
+        log_file (str): The path to the flow log file.
+        parts (int): The number of ranges to split the file into.
+
+    Returns:
+        list: A list of (start, end) byte offsets. Fewer than parts ranges are
+        returned for files too small to split evenly.
+    """
+    file_size = os.stat(log_file).st_size
+    if not file_size:  # Empty files can't be memory-mapped
+        return []
+
+    boundaries = [0]
+    with open(log_file, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as log_map:
+        for i in range(1, parts):
+            # Move the boundary to the start of the next line
+            newline = log_map.find(b"\n", file_size * i // parts)
+            boundaries.append(file_size if newline == -1 else newline + 1)
+    boundaries.append(file_size)
+    boundaries = sorted(set(boundaries))
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def parse_flow_logs_parallel(log_file, lookup, workers=None):
+    """Parses the flow logs in parallel worker processes and maps them to tags.
+
+    The file is split into one byte range per worker, aligned to line
+    boundaries, and the counts of all ranges are merged. Verbose output is not
+    supported.
+
+    Args:
+        log_file (str): The path to the flow log file.
+        lookup (dict): A dictionary with port/protocol combinations as keys and
+        tags as values.
+        workers (int, optional): The number of worker processes. Defaults to
+        None, using the number of CPUs.
+
+    Returns:
+        tuple: A tuple containing two Counters. 1st contains the tag counts,
+        and 2nd contains the port/protocol counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    tag_counts = Counter({UNTAGGED: 0})
     port_protocol_counts = Counter()
-    untagged_count = 0  # for exception handling
 
     try:
-        with open(log_file, "r") as file:
-            for line_number, line in enumerate(file, 1):
-                parts = line.strip().split()
-
-                if parts == []:  # Skip empty lines
-                    continue
-
-                if len(parts) < NUM_FIELDS:
-                    if verbose:
-                        print(
-                            f"Warning: Malformed log data at line {line_number}. Skipping..."
-                        )  # Add warning for malformed data
-                    continue
-
-                # Get port and protocol
-                dstport, protocol = parts[6].strip(), parts[7].strip()
-                try:
-                    # Convert protocol to actual protocol name
-                    protocol = PROTOCOL_MAP.get(int(protocol), "Unknown")
-                except ValueError:  # In case of malformed protocol number
-                    protocol = "Unknown"
-
-                key = (dstport, protocol)
-
-                # Match with lookup table
-                if key in lookup:
-                    if verbose:
-                        print(f"Found tag for {key}: {lookup[key]}")
-                    tag = lookup[key]
-                    tag_counts[tag] += 1
-                else:
-                    tag = "Untagged"
-                    untagged_count += 1
-
-                port_protocol_counts[key] += 1
-
-        tag_counts["Untagged"] = untagged_count
+        ranges = _split_ranges(log_file, workers)
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(lookup,)
+        ) as executor:
+            futures = [
+                executor.submit(_count_range, log_file, start, end)
+                for start, end in ranges
+            ]
+            for future in futures:
+                range_tag_counts, range_port_protocol_counts = future.result()
+                tag_counts.update(range_tag_counts)
+                port_protocol_counts.update(range_port_protocol_counts)
 
     except Exception as e:
         print(f"Error reading log file: {e}")
@@ -109,6 +393,43 @@ def parse_flow_logs(log_file, lookup, verbose=False):
     return tag_counts, port_protocol_counts
 
 
+def _write_rows(file, writer, rows):
+    """Writes rows to an open CSV file with a single write() call.
+
+    The rows are formatted directly instead of going through the csv writer row
+    by row. If any field needs quoting (it contains a delimiter, quote, escape
+    character or line break), all rows are handed to the csv writer instead, so
+    the output is the same either way. Line breaks are checked against the
+    dialect's line terminator, so it works with any terminator.
+
+    Args:
+        file (file): The open output file.
+        writer (csv.writer): The csv writer of the output file.
+        rows (list): A list of tuples with the same number of fields.
+    """
+    if not rows:
+        return
+
+    dialect = writer.dialect
+    row_format = dialect.delimiter.join(["%s"] * len(rows[0])) + dialect.lineterminator
+    body = "".join([row_format % row for row in rows])
+
+    # Plain fields add no delimiters, quotes or line breaks of their own, so every
+    # "\r" and "\n" in the body must come from the line terminators
+    lines = len(rows)
+    terminator = dialect.lineterminator
+    if (
+        body.count(dialect.delimiter) == (len(rows[0]) - 1) * lines
+        and dialect.quotechar not in body
+        and (dialect.escapechar is None or dialect.escapechar not in body)
+        and body.count("\r") == terminator.count("\r") * lines
+        and body.count("\n") == terminator.count("\n") * lines
+    ):
+        file.write(body)
+    else:
+        writer.writerows(rows)
+
+
 def write_output_file(output_file, tag_counts, port_protocol_counts, reverse=False):
     """Writes the output files.
 
@@ -122,20 +443,24 @@ def write_output_file(output_file, tag_counts, port_protocol_counts, reverse=Fal
     """
     try:
         # Sort the results for better readability, reverse=True for descending order
-        sorted_tags = dict(sorted(tag_counts.items(), reverse=reverse))
-        sorted_ports = dict(sorted(port_protocol_counts.items(), reverse=reverse))
+        sorted_tags = sorted(tag_counts.items(), reverse=reverse)
+        sorted_ports = sorted(
+            (
+                (port, protocol, count)
+                for (port, protocol), count in port_protocol_counts.items()
+            ),
+            reverse=reverse,
+        )
 
         with open(output_file, "w", newline="") as tag_file:
             writer = csv.writer(tag_file)
             writer.writerow(["Tag Counts:"])
             writer.writerow(["Tag", "Count"])
-            for tag, count in sorted_tags.items():
-                writer.writerow([tag, count])
+            _write_rows(tag_file, writer, sorted_tags)
             writer.writerow([])
             writer.writerow(["Port/Protocol Combination Counts:"])
             writer.writerow(["Port", "Protocol", "Count"])
-            for (port, protocol), count in sorted_ports.items():
-                writer.writerow([port, protocol, count])
+            _write_rows(tag_file, writer, sorted_ports)
 
     except Exception as e:
         print(f"Error writing output files: {e}")
@@ -156,6 +481,7 @@ python flow_log_parser.py -l custom_lookup.csv         # Use custom lookup file
 python flow_log_parser.py --log custom_flow.txt        # Use custom log file
 python flow_log_parser.py -o custom_output.csv         # Use custom output file
 python flow_log_parser.py -r                           # Sort in descending order
+python flow_log_parser.py -w 4                         # Parse with 4 worker processes
 python flow_log_parser.py -V                           # Run with verbose output
 """,
     )
@@ -188,6 +514,13 @@ python flow_log_parser.py -V                           # Run with verbose output
     )
 
     # Optional arguments
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used to parse the flow log, per-record verbose output is skipped when greater than 1 (default: 1)",
+    )
     parser.add_argument(
         "-V", "--verbose", action="store_true", help="Enable verbose output"
     )
@@ -213,7 +546,14 @@ python flow_log_parser.py -V                           # Run with verbose output
         print()
 
     lookup = load_lookup_table(args.lookup, args.verbose)
-    tag_counts, port_protocol_counts = parse_flow_logs(args.log, lookup, args.verbose)
+    if args.workers > 1:
+        tag_counts, port_protocol_counts = parse_flow_logs_parallel(
+            args.log, lookup, args.workers
+        )
+    else:
+        tag_counts, port_protocol_counts = parse_flow_logs(
+            args.log, lookup, args.verbose
+        )
 
     if args.verbose:
         print(tag_counts)
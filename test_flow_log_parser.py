@@ -1,9 +1,18 @@
+import contextlib
+import csv
+import io
 import os
 import tempfile
 import time
 import unittest
 
-from flow_log_parser import load_lookup_table, parse_flow_logs, write_output_file
+from flow_log_parser import (
+    _read_line_chunks,
+    load_lookup_table,
+    parse_flow_logs,
+    parse_flow_logs_parallel,
+    write_output_file,
+)
 
 
 # Helper function to generate a large lookup table
@@ -76,6 +85,18 @@ class TestFlowLogParser(unittest.TestCase):
         self.assertEqual(lookup[("443", "tcp")], "secure-web")
         self.assertEqual(lookup[("53", "udp")], "dns")
 
+    def test_load_lookup_table_cache(self):
+        lookup = load_lookup_table(self.lookup_file.name)
+        # Unchanged file should be served from the cache
+        self.assertIs(load_lookup_table(self.lookup_file.name), lookup)
+
+        # Modified file should be re-read
+        with open(self.lookup_file.name, "a") as file:
+            file.write("25,tcp,sv_P1\n")
+        reloaded = load_lookup_table(self.lookup_file.name)
+        self.assertIsNot(reloaded, lookup)
+        self.assertEqual(reloaded[("25", "tcp")], "sv_P1")
+
     def test_parse_flow_logs(self):
         lookup = load_lookup_table(self.lookup_file.name)
         tag_counts, port_protocol_counts = parse_flow_logs(
@@ -103,6 +124,31 @@ class TestFlowLogParser(unittest.TestCase):
         self.assertTrue(os.path.exists(self.output_file.name))
         self.assertGreater(os.path.getsize(self.output_file.name), 0)
 
+    def test_write_output_file_matches_csv_writer(self):
+        port_protocol_counts = {("80", "tcp"): 2, ("53", "udp"): 1}
+        for tag_counts in (
+            {"web-traffic": 2, "dns": 1, "Untagged": 0},
+            {"web, traffic": 2, "dns": 1},  # Needs quoting for the delimiter
+            {'dns "udp"': 1},  # Needs quoting for the quote character
+            {"multi\r\nline": 3},  # Needs quoting for the line break
+        ):
+            write_output_file(self.output_file.name, tag_counts, port_protocol_counts)
+
+            # Output should be byte-identical to writing every row with csv.writer
+            expected = io.StringIO(newline="")
+            writer = csv.writer(expected)
+            writer.writerow(["Tag Counts:"])
+            writer.writerow(["Tag", "Count"])
+            writer.writerows(sorted(tag_counts.items()))
+            writer.writerow([])
+            writer.writerow(["Port/Protocol Combination Counts:"])
+            writer.writerow(["Port", "Protocol", "Count"])
+            writer.writerows(
+                sorted((p, pr, c) for (p, pr), c in port_protocol_counts.items())
+            )
+            with open(self.output_file.name, newline="") as file:
+                self.assertEqual(file.read(), expected.getvalue())
+
     def test_performance(self):
         # Generate large test files
         large_lookup = generate_large_lookup_file()
@@ -121,6 +167,19 @@ class TestFlowLogParser(unittest.TestCase):
         os.unlink(large_lookup)
         os.unlink(large_flow_log)
 
+    def test_parse_flow_logs_parallel(self):
+        large_lookup = generate_large_lookup_file()
+        large_flow_log = generate_large_flow_log()
+
+        lookup = load_lookup_table(large_lookup)
+        expected = parse_flow_logs(large_flow_log, lookup)
+
+        # Byte ranges must split on line boundaries, so counts match exactly
+        self.assertEqual(parse_flow_logs_parallel(large_flow_log, lookup, 3), expected)
+
+        os.unlink(large_lookup)
+        os.unlink(large_flow_log)
+
     def test_empty_files(self):
         # Create empty files
         empty_lookup = tempfile.NamedTemporaryFile(mode="w", delete=False)
@@ -163,6 +222,39 @@ invalid_line
 
         os.unlink(malformed_lookup.name)
 
+    def test_quoted_lookup_data(self):
+        for data, tag in (
+            ('port,protocol,tag\n25,tcp,"a,b"\n80,tcp,web-traffic\n', "a,b"),
+            # Form feeds are not line breaks for csv, so neither for plain splits
+            ("port,protocol,tag\n25,tcp,a\x0cb\n80,tcp,web-traffic\n", "a\x0cb"),
+        ):
+            quoted_lookup = tempfile.NamedTemporaryFile(mode="w", delete=False)
+            quoted_lookup.write(data)
+            quoted_lookup.close()
+
+            lookup = load_lookup_table(quoted_lookup.name)
+            self.assertEqual(lookup, {("25", "tcp"): tag, ("80", "tcp"): "web-traffic"})
+
+            os.unlink(quoted_lookup.name)
+
+    def test_malformed_lookup_warnings_cached(self):
+        malformed_lookup = tempfile.NamedTemporaryFile(mode="w", delete=False)
+        malformed_lookup.write("port,protocol,tag\n80,tcp,web-traffic\ninvalid_line\n")
+        malformed_lookup.close()
+
+        # Warnings should be printed on every verbose load, even from the cache
+        for _ in range(2):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                lookup = load_lookup_table(malformed_lookup.name, verbose=True)
+            self.assertEqual(
+                output.getvalue(),
+                "Warning: Malformed lookup data at line 2. Skipping...\n",
+            )
+            self.assertEqual(lookup, {("80", "tcp"): "web-traffic"})
+
+        os.unlink(malformed_lookup.name)
+
     def test_malformed_flow_logs(self):
         malformed_flow = tempfile.NamedTemporaryFile(mode="w", delete=False)
         malformed_flow.write(
@@ -189,6 +281,32 @@ invalid line
 
         os.unlink(malformed_flow.name)
 
+    def test_parse_flow_logs_verbose(self):
+        malformed_flow = tempfile.NamedTemporaryFile(mode="w", delete=False)
+        malformed_flow.write(
+            """
+2 123456789 eni-abc123 10.0.0.1 10.0.0.2 12345 80 6 100 1000 1234567890 1234567899 ACCEPT OK
+invalid line
+2 123456789 eni-abc123 10.0.0.1 10.0.0.2 12345 443 999999 100 1000 1234567890 1234567899 ACCEPT OK
+2 123456789 eni-abc123 10.0.0.1 10.0.0.2 12345 53 17 100 1000 1234567890 1234567899 ACCEPT OK
+"""
+        )
+        malformed_flow.close()
+
+        lookup = load_lookup_table(self.lookup_file.name)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            verbose_counts = parse_flow_logs(malformed_flow.name, lookup, verbose=True)
+
+        # Verbose parsing should count the same as the quiet path
+        self.assertEqual(verbose_counts, parse_flow_logs(malformed_flow.name, lookup))
+        self.assertIn(
+            "Warning: Malformed log data at line 3. Skipping...", output.getvalue()
+        )
+        self.assertIn("Found tag for ('80', 'tcp'): web-traffic", output.getvalue())
+
+        os.unlink(malformed_flow.name)
+
     def test_invalid_protocols(self):
         invalid_protocol_flow = tempfile.NamedTemporaryFile(mode="w", delete=False)
         invalid_protocol_flow.write(
@@ -230,6 +348,27 @@ invalid line
 
         os.unlink(duplicate_lookup.name)
 
+    def test_read_line_chunks(self):
+        # Lines split across block boundaries should be joined back together
+        data = b"first line\nsecond line\n\nlast line"
+        chunks = list(_read_line_chunks(io.BytesIO(data), chunk_size=4))
+        lines = [line for chunk in chunks for line in chunk]
+        self.assertEqual(lines, ["first line", "second line", "", "last line"])
+
+    def test_read_line_chunks_line_endings(self):
+        # CRLF and bare CR line endings split lines like text mode does, a CRLF
+        # split across block boundaries must not produce an extra empty line
+        expected = ["first line", "second line", "", "last line"]
+        for data in (
+            b"first line\r\nsecond line\r\n\r\nlast line\r\n",
+            b"first line\rsecond line\r\rlast line\r",
+            b"first line\rsecond line\n\r\nlast line",
+        ):
+            for chunk_size in (1, 3, 4, 1024):
+                chunks = _read_line_chunks(io.BytesIO(data), chunk_size=chunk_size)
+                lines = [line for chunk in chunks for line in chunk]
+                self.assertEqual(lines, expected, (data, chunk_size))
+
 
 if __name__ == "__main__":
     unittest.main()